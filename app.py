@@ -4,6 +4,9 @@ import pandas as pd
 import numpy as np
 import os
 import time
+import atexit
+from profiling import timer, incr, serve_metrics, profiler_from_env, PROFILE_ENV
+from quantize import load_quantized
 
 # =========================
 # PAGE CONFIG
@@ -15,15 +18,34 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# =========================
+# INSTRUMENTATION
+# =========================
+@st.cache_resource
+def start_instrumentation():
+    # Runs once per server process: optional sampling profiler + /metrics endpoint
+    profiler = profiler_from_env()
+    if profiler is not None:
+        atexit.register(profiler.dump, os.environ[PROFILE_ENV])
+    serve_metrics(profiler=profiler)
+    return profiler
+
+start_instrumentation()
+
 # =========================
 # LOAD MODELS & OBJECTS
 # =========================
 @st.cache_resource
 def load_models():
     try:
-        model = joblib.load("heart_model.pkl")
-        encoders = joblib.load("encoders.pkl")
-        scaler = joblib.load("scaler.pkl")
+        with timer("load_models"):
+            # Prefer the compact forest exported by quantize.py when it was
+            # built from the current heart_model.pkl
+            model = load_quantized()
+            if model is None:
+                model = joblib.load("heart_model.pkl")
+            encoders = joblib.load("encoders.pkl")
+            scaler = joblib.load("scaler.pkl")
         return model, encoders, scaler
     except FileNotFoundError as e:
         st.error(f"❌ Error loading model files: {e}")
@@ -495,16 +517,19 @@ else:
         })
 
         # Apply Label Encoding
-        for col in encoders:
-            if col in input_df.columns:
-                input_df[col] = encoders[col].transform(input_df[col])
+        with timer("encoding"):
+            for col in encoders:
+                if col in input_df.columns:
+                    input_df[col] = encoders[col].transform(input_df[col])
 
         # Apply Scaling
-        input_scaled = scaler.transform(input_df)
+        with timer("scaling"):
+            input_scaled = scaler.transform(input_df)
 
         # Predict
-        prediction = model.predict(input_scaled)[0]
-        proba = model.predict_proba(input_scaled)[0]
+        with timer("inference"):
+            prediction = model.predict(input_scaled)[0]
+            proba = model.predict_proba(input_scaled)[0]
 
         # Probability of Heart Disease
         heart_prob = proba[1]
@@ -532,6 +557,9 @@ else:
             recommendation = "Significant risk factors detected. Please consult a cardiologist as soon as possible for a comprehensive evaluation."
             emoji_celebration = "🆘"
 
+        incr("predictions")
+        incr("risk_" + risk_label.lower().replace(" ", "_"))
+
         # Display Results with dramatic reveal
         st.markdown(f'<h2 style="text-align: center; color: white; text-shadow: 0 0 20px rgba(255,255,255,0.5);">{emoji_celebration} Prediction Results {emoji_celebration}</h2>', unsafe_allow_html=True)
         
@@ -589,14 +617,16 @@ else:
         log_data["timestamp"] = pd.Timestamp.now()
 
         log_file = "prediction_logs.csv"
-        if os.path.exists(log_file):
-            log_data.to_csv(log_file, mode="a", header=False, index=False)
-        else:
-            log_data.to_csv(log_file, index=False)
+        with timer("logging"):
+            if os.path.exists(log_file):
+                log_data.to_csv(log_file, mode="a", header=False, index=False)
+            else:
+                log_data.to_csv(log_file, index=False)
 
         st.info("📁 Prediction logged successfully.")
 
     except Exception as e:
+        incr("prediction_errors")
         st.error(f"❌ Error during prediction: {e}")
         st.info("Please ensure all inputs are valid and try again.")
 
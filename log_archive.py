@@ -0,0 +1,474 @@
+import os
+import sys
+import csv
+import math
+import time
+import zlib
+import struct
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Input columns in the order app.py builds input_df
+FEATURES = ["age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+            "thalch", "exang", "oldpeak", "slope", "ca", "thal"]
+
+# =========================
+# FORMAT
+# =========================
+# An archive is a file header followed by independently compressed blocks:
+#
+#   file header : b"HLA1"
+#   block header: magic, min_ts, max_ts, n_records, dict_len, data_len
+#   dict section: zlib(new usernames, new labels, new feature vectors)
+#   data section: zlib(columns for n_records records)
+#
+# Usernames, labels and 13-feature vectors are dictionary-encoded. Each
+# block only carries the entries it introduced, so appends never rewrite
+# earlier blocks. The data section is fixed-width little-endian columns
+# (see DATA_COLUMNS); timestamps are microseconds since the epoch stored
+# as deltas from the previous record. Block headers hold the time range,
+# so a range query only decompresses the data sections that overlap it.
+FILE_MAGIC = b"HLA1"
+BLOCK_MAGIC = b"HLB1"
+BLOCK_HEADER = struct.Struct("<4sqqIII")
+VECTOR = struct.Struct(f"<{len(FEATURES)}d")
+DATA_COLUMNS = [
+    ("ts_delta", "<i8"),
+    ("vector_id", "<u4"),
+    ("username_id", "<u4"),   # 0 = missing, else index + 1
+    ("label_id", "<u4"),      # 0 = missing, else index + 1
+    ("prediction", "i1"),     # -1 = missing
+    ("probability", "<f8"),   # NaN = missing
+]
+
+DEFAULT_BLOCK_SIZE = 4096
+LOG_FILES = ['prediction_logs.csv', 'user_inputs.csv']
+ARCHIVE_EXT = '.hla'
+PENDING_EXT = '.compacting'
+
+COLUMNS = FEATURES + ["username", "prediction", "prediction_label", "probability", "timestamp"]
+EPOCH = datetime(1970, 1, 1)
+
+
+# =========================
+# ENCODING HELPERS
+# =========================
+def _put_varint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _get_varint(data, pos):
+    n = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _put_str(buf, s):
+    raw = s.encode("utf-8")
+    _put_varint(buf, len(raw))
+    buf += raw
+
+
+def _get_str(data, pos):
+    n, pos = _get_varint(data, pos)
+    return data[pos:pos + n].decode("utf-8"), pos + n
+
+
+def to_micros(ts):
+    return (ts - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(us):
+    return EPOCH + timedelta(microseconds=us)
+
+
+# =========================
+# CSV LOG PARSING
+# =========================
+# Column aliases used by older log headers
+HEADER_ALIASES = {"heart_disease_prob": "probability"}
+
+# Columns after the features (timestamp excluded) that app.py has written
+# to an existing file, keyed by total field count. app.py only writes a
+# header when it creates the file, so appended rows can follow a newer
+# layout than the header they sit under.
+APP_LAYOUTS = {
+    16: ("prediction", "prediction_label"),
+    17: ("username", "prediction", "probability"),
+    18: ("username", "prediction", "prediction_label", "probability"),
+}
+PREDICTION_VALUES = {"0", "1"}
+
+
+def header_layout(header):
+    """Columns between the features and the timestamp named by a header."""
+    return tuple(HEADER_ALIASES.get(col, col) for col in header[len(FEATURES):-1])
+
+
+def row_layout(header_cols, row):
+    """Pick the column layout for a row from its field count and the header.
+
+    Values are never type-sniffed: the username is free text and may look
+    like a number ("1234", "Nan"). The only ambiguity is a row as wide as
+    the header but app.py's layout for that width names different columns
+    (prediction_logs.csv: header has prediction_label, later rows have
+    username + probability instead). Those are told apart by the field at
+    app.py's prediction position, which holds 0 or 1 in app.py rows and the
+    generated prediction_label text in header rows; the username is never
+    inspected.
+    """
+    app_cols = APP_LAYOUTS.get(len(row))
+    if len(row) == len(FEATURES) + len(header_cols) + 1:
+        if app_cols is None or app_cols == header_cols:
+            return header_cols
+        pos = len(FEATURES) + app_cols.index("prediction")
+        return app_cols if row[pos] in PREDICTION_VALUES else header_cols
+    if app_cols is None:
+        raise ValueError(f"unexpected row with {len(row)} fields")
+    return app_cols
+
+
+def parse_log_row(row, header_cols):
+    """Normalise one CSV log row into a record dict."""
+    record = {col: float(v) for col, v in zip(FEATURES, row)}
+    record["timestamp"] = to_micros(datetime.fromisoformat(row[-1]))
+    record["username"] = None
+    record["prediction"] = None
+    record["prediction_label"] = None
+    record["probability"] = None
+    for col, value in zip(row_layout(header_cols, row), row[len(FEATURES):-1]):
+        if col == "prediction":
+            record[col] = int(value)
+        elif col == "probability":
+            record[col] = float(value)
+        elif col in ("username", "prediction_label"):
+            record[col] = value
+    return record
+
+
+def _read_csv_rows(path):
+    """(record, size of the row in the CSV in bytes) for every data row."""
+    consumed = 0
+
+    def lines(f):
+        nonlocal consumed
+        for raw in f:
+            consumed += len(raw)
+            yield raw.decode("utf-8")
+
+    with open(path, "rb") as f:
+        reader = csv.reader(lines(f))
+        header = next(reader, None)
+        if header is None:
+            return []
+        header_cols = header_layout(header)
+        rows = []
+        start = consumed
+        for row in reader:
+            if row:
+                try:
+                    rows.append((parse_log_row(row, header_cols), consumed - start))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{reader.line_num}: {e}") from None
+            start = consumed
+        return rows
+
+
+def read_csv_log(path):
+    return [record for record, _ in _read_csv_rows(path)]
+
+
+# =========================
+# ARCHIVE
+# =========================
+class LogArchive:
+    """Append-only, block-compressed archive of prediction log records."""
+
+    def __init__(self, path, block_size=DEFAULT_BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.blocks = []  # (data_offset, min_ts, max_ts, n_records, data_len)
+        self._reset()
+
+    # ---------- reading ----------
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as f:
+            if f.read(len(FILE_MAGIC)) != FILE_MAGIC:
+                raise ValueError(f"{self.path} is not a log archive")
+            while True:
+                block_start = f.tell()
+                header = f.read(BLOCK_HEADER.size)
+                if not header:
+                    break
+                corrupt = (f"{self.path}: corrupt or truncated block at byte {block_start} "
+                           f"(the archive is intact up to that offset)")
+                if len(header) < BLOCK_HEADER.size:
+                    raise ValueError(corrupt)
+                magic, min_ts, max_ts, n, dict_len, data_len = BLOCK_HEADER.unpack(header)
+                if magic != BLOCK_MAGIC or f.tell() + dict_len + data_len > size:
+                    raise ValueError(corrupt)
+                try:
+                    self._load_dict(zlib.decompress(f.read(dict_len)))
+                except (zlib.error, IndexError, struct.error, UnicodeDecodeError):
+                    raise ValueError(corrupt) from None
+                self.blocks.append((f.tell(), min_ts, max_ts, n, data_len))
+                f.seek(data_len, os.SEEK_CUR)
+
+    def _reset(self):
+        self.usernames, self.labels, self.vectors = [], [], []
+        self._username_ids, self._label_ids, self._vector_ids = {}, {}, {}
+        self.blocks = []
+        if os.path.exists(self.path):
+            self._load_index()
+
+    def _load_dict(self, data):
+        pos = 0
+        for table, ids in ((self.usernames, self._username_ids), (self.labels, self._label_ids)):
+            count, pos = _get_varint(data, pos)
+            for _ in range(count):
+                s, pos = _get_str(data, pos)
+                ids[s] = len(table)
+                table.append(s)
+        count, pos = _get_varint(data, pos)
+        for _ in range(count):
+            vec = VECTOR.unpack_from(data, pos)
+            pos += VECTOR.size
+            self._vector_ids[vec] = len(self.vectors)
+            self.vectors.append(vec)
+
+    def _decode_block(self, data, n):
+        columns = {}
+        pos = 0
+        for name, dtype in DATA_COLUMNS:
+            columns[name] = np.frombuffer(data, dtype=dtype, count=n, offset=pos)
+            pos += n * np.dtype(dtype).itemsize
+        columns["timestamp"] = np.cumsum(columns.pop("ts_delta"))
+        return columns
+
+    def read(self, start=None, end=None):
+        """Records with start <= timestamp < end as a DataFrame.
+
+        start / end may be datetimes or strings; None leaves that side open.
+        """
+        lo = to_micros(pd.Timestamp(start).to_pydatetime()) if start is not None else None
+        hi = to_micros(pd.Timestamp(end).to_pydatetime()) if end is not None else None
+        parts = []
+        if self.blocks:
+            with open(self.path, "rb") as f:
+                for offset, min_ts, max_ts, n, data_len in self.blocks:
+                    if (lo is not None and max_ts < lo) or (hi is not None and min_ts >= hi):
+                        continue
+                    f.seek(offset)
+                    columns = self._decode_block(zlib.decompress(f.read(data_len)), n)
+                    keep = np.ones(n, dtype=bool)
+                    if lo is not None:
+                        keep &= columns["timestamp"] >= lo
+                    if hi is not None:
+                        keep &= columns["timestamp"] < hi
+                    parts.append({k: v[keep] for k, v in columns.items()})
+
+        names = [name for name, _ in DATA_COLUMNS[1:]] + ["timestamp"]
+        if parts:
+            cols = {k: np.concatenate([p[k] for p in parts]) for k in names}
+        else:
+            cols = {k: np.zeros(0, dtype=np.int64) for k in names}
+
+        vectors = np.array(self.vectors, dtype=np.float64).reshape(-1, len(FEATURES))
+        df = pd.DataFrame(vectors[cols["vector_id"]], columns=FEATURES)
+        df["username"] = np.array([None] + self.usernames, dtype=object)[cols["username_id"]]
+        df["prediction"] = pd.array(np.where(cols["prediction"] < 0, None, cols["prediction"]), dtype="Int64")
+        df["prediction_label"] = np.array([None] + self.labels, dtype=object)[cols["label_id"]]
+        df["probability"] = cols["probability"].astype(np.float64)
+        df["timestamp"] = pd.to_datetime(cols["timestamp"], unit="us")
+        return df
+
+    def __len__(self):
+        return sum(b[3] for b in self.blocks)
+
+    # ---------- writing ----------
+    def _intern(self, table, ids, key, new):
+        if key not in ids:
+            ids[key] = len(table)
+            table.append(key)
+            new.append(key)
+        return ids[key]
+
+    def _encode_block(self, records):
+        new_usernames, new_labels, new_vectors = [], [], []
+        n = len(records)
+        columns = {name: np.zeros(n, dtype=dtype) for name, dtype in DATA_COLUMNS}
+        prev_ts = 0
+        for i, r in enumerate(records):
+            vec = tuple(float(r[col]) for col in FEATURES)
+            columns["vector_id"][i] = self._intern(self.vectors, self._vector_ids, vec, new_vectors)
+            if r.get("username") is not None:
+                columns["username_id"][i] = self._intern(self.usernames, self._username_ids,
+                                                         r["username"], new_usernames) + 1
+            if r.get("prediction_label") is not None:
+                columns["label_id"][i] = self._intern(self.labels, self._label_ids,
+                                                      r["prediction_label"], new_labels) + 1
+            prediction = r.get("prediction")
+            columns["prediction"][i] = -1 if prediction is None else prediction
+            probability = r.get("probability")
+            columns["probability"][i] = math.nan if probability is None else float(probability)
+            columns["ts_delta"][i] = r["timestamp"] - prev_ts
+            prev_ts = r["timestamp"]
+
+        dict_buf = bytearray()
+        for table in (new_usernames, new_labels):
+            _put_varint(dict_buf, len(table))
+            for s in table:
+                _put_str(dict_buf, s)
+        _put_varint(dict_buf, len(new_vectors))
+        for vec in new_vectors:
+            dict_buf += VECTOR.pack(*vec)
+
+        data_buf = b"".join(columns[name].tobytes() for name, _ in DATA_COLUMNS)
+        return zlib.compress(bytes(dict_buf), 9), zlib.compress(data_buf, 9)
+
+    def append(self, records):
+        """Append record dicts (as produced by read_csv_log) in new blocks."""
+        records = list(records)
+        if not records:
+            return
+        # Validate before writing anything so a bad record never leaves a partial append
+        limit = np.iinfo(np.int8).max
+        for r in records:
+            prediction = r.get("prediction")
+            if prediction is not None and not 0 <= prediction <= limit:
+                raise ValueError(f"prediction {prediction!r} does not fit the archive's int8 column")
+        new_file = not os.path.exists(self.path)
+        original_size = 0 if new_file else os.path.getsize(self.path)
+        try:
+            with open(self.path, "ab") as f:
+                if new_file:
+                    f.write(FILE_MAGIC)
+                for i in range(0, len(records), self.block_size):
+                    chunk = records[i:i + self.block_size]
+                    dict_data, data = self._encode_block(chunk)
+                    stamps = [r["timestamp"] for r in chunk]
+                    f.write(BLOCK_HEADER.pack(BLOCK_MAGIC, min(stamps), max(stamps),
+                                              len(chunk), len(dict_data), len(data)))
+                    f.write(dict_data)
+                    self.blocks.append((f.tell(), min(stamps), max(stamps), len(chunk), len(data)))
+                    f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            # Roll back to the last complete block (e.g. disk full) so later
+            # appends never land after a partial one
+            if new_file:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                os.truncate(self.path, original_size)
+            self._reset()
+            raise
+
+
+# =========================
+# COMPACTION JOB
+# =========================
+def _best_time(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compact(csv_path, archive_path=None, rotate=False):
+    """Move a CSV log into its archive and report size and read speed.
+
+    Without rotate the CSV stays in place and is re-read on the next run,
+    so only rows newer than the archive's latest timestamp are appended.
+
+    With rotate=True the CSV is first renamed to <csv>.compacting; app.py
+    opens the log for every write and starts a fresh file when it is
+    missing, so nothing logged during the job is lost. Every row of the
+    renamed copy is appended, whatever its timestamp (app.py logs naive
+    local time, which can step backwards), and the copy is deleted right
+    after the append succeeds. If the job fails before that, the copy is
+    left in place and picked up by the next run.
+    """
+    archive_path = archive_path or os.path.splitext(csv_path)[0] + ARCHIVE_EXT
+    source = csv_path
+    if rotate:
+        source = csv_path + PENDING_EXT
+        if not os.path.exists(source):
+            os.replace(csv_path, source)
+    csv_file_bytes = os.path.getsize(source)
+    rows = _read_csv_rows(source)
+
+    archive = LogArchive(archive_path)
+    if archive.blocks and not rotate:
+        last_ts = max(b[2] for b in archive.blocks)
+        rows = [(r, size) for r, size in rows if r["timestamp"] > last_ts]
+    records = [r for r, _ in rows]
+    csv_bytes = sum(size for _, size in rows)
+    # Same parse the archive replaces: every row, layouts normalised
+    csv_read_seconds = _best_time(lambda: read_csv_log(source))
+    archive_before = os.path.getsize(archive_path) if os.path.exists(archive_path) else 0
+    archive.append(records)
+    if rotate:
+        os.remove(source)
+    archive_file_bytes = os.path.getsize(archive_path) if os.path.exists(archive_path) else 0
+    added_bytes = archive_file_bytes - archive_before
+
+    report = {
+        "csv": csv_path,
+        "archive": archive_path,
+        "records": len(records),
+        "unique_vectors": len({tuple(r[c] for c in FEATURES) for r in records}),
+        # Bytes of just the rows appended in this run, in each format
+        "csv_bytes": csv_bytes,
+        "archive_bytes": added_bytes,
+        "reduction": 1 - added_bytes / csv_bytes if records else None,
+        "csv_file_bytes": csv_file_bytes,
+        "archive_file_bytes": archive_file_bytes,
+        "csv_read_seconds": csv_read_seconds,
+        "archive_read_seconds": _best_time(lambda: LogArchive(archive_path).read()),
+    }
+    if records:
+        stamps = sorted(r["timestamp"] for r in records)
+        mid = from_micros(stamps[len(stamps) // 2])
+        report["range_read_seconds"] = _best_time(lambda: LogArchive(archive_path).read(start=mid))
+
+    return report
+
+
+def print_compaction_report(report):
+    print(f"{report['csv']} -> {report['archive']}")
+    print(f"  Records: {report['records']} ({report['unique_vectors']} unique feature vectors)")
+    if report["reduction"] is None:
+        print("  Nothing new to archive")
+    else:
+        change = "smaller" if report["reduction"] >= 0 else "larger"
+        print(f"  Appended rows: {report['csv_bytes']:,} bytes as CSV -> "
+              f"{report['archive_bytes']:,} bytes archived ({abs(report['reduction']):.1%} {change})")
+    print(f"  Files: CSV {report['csv_file_bytes']:,} bytes, archive {report['archive_file_bytes']:,} bytes")
+    print(f"  Full read: CSV {report['csv_read_seconds'] * 1e3:.2f} ms, "
+          f"archive {report['archive_read_seconds'] * 1e3:.2f} ms")
+    if "range_read_seconds" in report:
+        print(f"  Range read (second half): {report['range_read_seconds'] * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    # python log_archive.py [--rotate] [log.csv ...]
+    args = sys.argv[1:]
+    rotate = "--rotate" in args
+    paths = [a for a in args if a != "--rotate"] or LOG_FILES
+    for path in paths:
+        if os.path.exists(path) or (rotate and os.path.exists(path + PENDING_EXT)):
+            print_compaction_report(compact(path, rotate=rotate))
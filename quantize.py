@@ -0,0 +1,407 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+
+# =========================
+# CONFIG
+# =========================
+MODEL_FILE = 'heart_model.pkl'
+QUANTIZED_MODEL_FILE = 'heart_model_q.pkl'
+REPORT_FILE = 'quantization_report_{mode}.json'
+
+MODES = ('float32', 'int16')
+LEAF_SCALE = 65535  # leaf probabilities stored as uint16 fixed-point (Q0.16)
+
+# Same bands as app.py
+LOW_RISK_MAX = 0.3
+MODERATE_RISK_MAX = 0.6
+
+# Slider / selectbox ranges from the app sidebar, used for synthetic inputs
+SYNTHETIC_RANGES = {
+    "age": (20, 100),
+    "trestbps": (90, 200),
+    "chol": (100, 600),
+    "thalch": (60, 220),
+    "oldpeak": (0.0, 6.0),
+    "ca": (0, 3),
+}
+SYNTHETIC_CHOICES = {
+    "sex": ["Male", "Female"],
+    "cp": ["typical angina", "atypical angina", "non-anginal", "asymptomatic"],
+    "fbs": ["False", "True"],
+    "restecg": ["normal", "st-t abnormality", "lv hypertrophy"],
+    "exang": ["False", "True"],
+    "slope": ["upsloping", "flat", "downsloping"],
+    "thal": ["normal", "fixed defect", "reversable defect"],
+}
+FEATURES = ["age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+            "thalch", "exang", "oldpeak", "slope", "ca", "thal"]
+
+
+def risk_band(prob):
+    if prob < LOW_RISK_MAX:
+        return "Low Risk"
+    elif prob < MODERATE_RISK_MAX:
+        return "Moderate Risk"
+    return "High Risk"
+
+
+# =========================
+# QUANTIZED FOREST
+# =========================
+class QuantizedForest:
+    """Flattened binary random forest with compact node arrays.
+
+    All trees share one set of node arrays; leaves point back at themselves
+    so a fixed number of vectorised steps (the deepest tree) reaches every
+    leaf. Thresholds are float32, or int16 bin codes when mode='int16', in
+    which case inputs are first mapped to the same codes via per-feature
+    edge tables. Leaf values are P(class 1) in uint16 fixed-point.
+
+    Exposes predict / predict_proba so it can stand in for the sklearn model.
+    source_sha256 fingerprints the model file it was built from; see
+    load_quantized.
+    """
+
+    def __init__(self, model, mode='float32', source_sha256=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        if len(model.classes_) != 2:
+            raise ValueError("QuantizedForest only supports binary classifiers")
+
+        self.mode = mode
+        self.source_sha256 = source_sha256
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.n_trees = len(model.estimators_)
+
+        trees = [est.tree_ for est in model.estimators_]
+        sizes = [t.node_count for t in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        total = int(sum(sizes))
+
+        feature = np.concatenate([t.feature for t in trees])
+        threshold = np.concatenate([t.threshold for t in trees])
+        left = np.concatenate([t.children_left + off for t, off in zip(trees, offsets)])
+        right = np.concatenate([t.children_right + off for t, off in zip(trees, offsets)])
+        value = np.concatenate([t.value[:, 0, :] for t in trees])
+        proba = value[:, 1] / value.sum(axis=1)
+
+        # Leaves: loop back to themselves on an always-true comparison
+        is_leaf = np.concatenate([t.children_left == -1 for t in trees])
+        node_ids = np.arange(total)
+        left[is_leaf] = node_ids[is_leaf]
+        right[is_leaf] = node_ids[is_leaf]
+        feature[is_leaf] = 0
+
+        if mode == 'float32':
+            # Round down so that, for float32 x, x <= t  <=>  x <= thr exactly
+            thr = threshold.astype(np.float32)
+            up = thr > threshold
+            thr[up] = np.nextafter(thr[up], np.float32(-np.inf))
+            thr[is_leaf] = np.inf
+            self.edges = None
+        else:
+            # Bin code of x = number of split thresholds on that feature
+            # strictly below x, so x <= t_k  <=>  code(x) <= k exactly.
+            thr = np.zeros(total, dtype=np.int16)
+            self.edges = []
+            for f in range(self.n_features_in_):
+                mask = ~is_leaf & (feature == f)
+                edges, codes = np.unique(threshold[mask], return_inverse=True)
+                if len(edges) > np.iinfo(np.int16).max:
+                    raise ValueError(f"feature {f} has too many thresholds for int16 codes")
+                thr[mask] = codes
+                self.edges.append(edges)
+            thr[is_leaf] = np.iinfo(np.int16).max
+
+        self.feature = feature.astype(np.int8 if self.n_features_in_ <= 127 else np.int16)
+        self.threshold = thr
+        # children[2 * node] is the left child, children[2 * node + 1] the right
+        self.children = np.column_stack([left, right]).ravel().astype(np.int32)
+        self.leaf_value = np.rint(np.where(is_leaf, proba, 0) * LEAF_SCALE).astype(np.uint16)
+        self.roots = offsets.astype(np.int32)
+        self.max_depth = max(est.get_depth() for est in model.estimators_)
+
+    def _encode(self, X):
+        # sklearn compares float32 inputs against the split thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2:
+            raise ValueError(f"Expected 2D array, got {X.ndim}D array instead. "
+                             "Reshape with X.reshape(1, -1) for a single sample.")
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but QuantizedForest is "
+                             f"expecting {self.n_features_in_} features as input.")
+        if self.mode == 'float32':
+            return X
+        codes = np.empty(X.shape, dtype=np.int16)
+        for f, edges in enumerate(self.edges):
+            codes[:, f] = np.searchsorted(edges, X[:, f].astype(np.float64), side='left')
+        return codes
+
+    def leaf_sum(self, X):
+        """Sum of fixed-point leaf values over all trees, one per row."""
+        Xq = self._encode(X)
+        n, n_features = Xq.shape
+        flat = Xq.ravel()
+        row_base = (np.arange(n, dtype=np.intp) * n_features)[:, None]
+        node = np.broadcast_to(self.roots, (n, self.n_trees))
+        for _ in range(self.max_depth):
+            go_right = flat[row_base + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+        return self.leaf_value[node].sum(axis=1, dtype=np.uint32)
+
+    def predict_proba(self, X):
+        p1 = self.leaf_sum(X) / (self.n_trees * LEAF_SCALE)
+        return np.column_stack([1.0 - p1, p1])
+
+    def predict(self, X):
+        # argmax of predict_proba with ties going to class 0, as in sklearn
+        positive = 2 * self.leaf_sum(X).astype(np.int64) > self.n_trees * LEAF_SCALE
+        return self.classes_[positive.astype(int)]
+
+    def memory(self):
+        """Bytes per kind of array, matching sklearn_forest_memory."""
+        edges = sum(e.nbytes for e in self.edges) if self.edges is not None else 0
+        return {
+            "thresholds": self.threshold.nbytes + edges,
+            "leaf_values": self.leaf_value.nbytes,
+            "structure": self.feature.nbytes + self.children.nbytes + self.roots.nbytes,
+            "training_only": 0,
+        }
+
+    def nbytes(self):
+        return sum(self.memory().values())
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_quantized(path=QUANTIZED_MODEL_FILE, source=MODEL_FILE):
+    """The quantized forest at path, or None if it is missing or was not
+    built from the current source model file."""
+    if not os.path.exists(path):
+        return None
+    qmodel = joblib.load(path)
+    if getattr(qmodel, 'source_sha256', None) != file_sha256(source):
+        warnings.warn(f"{path} was not built from the current {source}; ignoring it. "
+                      f"Re-run quantize.py or train_model.py to rebuild it.")
+        return None
+    return qmodel
+
+
+def sklearn_forest_memory(model):
+    """Bytes per kind of array across every tree in the forest.
+
+    scikit-learn keeps one 64-byte struct per node, so besides the float64
+    threshold and the child/feature indices it also carries impurity,
+    sample counts and padding that inference never reads ("training_only").
+    """
+    memory = {"thresholds": 0, "leaf_values": 0, "structure": 0, "training_only": 0}
+    for est in model.estimators_:
+        state = est.tree_.__getstate__()
+        nodes = state['nodes']
+        fields = nodes.dtype.fields
+        threshold = fields['threshold'][0].itemsize * len(nodes)
+        structure = sum(fields[f][0].itemsize for f in ('left_child', 'right_child', 'feature')) * len(nodes)
+        memory["thresholds"] += threshold
+        memory["leaf_values"] += state['values'].nbytes
+        memory["structure"] += structure
+        memory["training_only"] += nodes.nbytes - threshold - structure
+    return memory
+
+
+# =========================
+# VERIFICATION DATA
+# =========================
+def load_heart_features(encoders, path='heart.csv'):
+    """heart.csv cleaned and encoded the same way as train_model.train()."""
+    df = pd.read_csv(path)
+    for col in ['id', 'dataset', 'num']:
+        if col in df.columns:
+            df = df.drop(columns=[col])
+    for col in df.select_dtypes(include=[np.number]).columns:
+        if df[col].isnull().any():
+            df[col] = df[col].fillna(df[col].median())
+    for col in df.select_dtypes(exclude=[np.number, 'bool']).columns:
+        if df[col].isnull().any():
+            df[col] = df[col].fillna(df[col].mode()[0])
+    for col in encoders:
+        if col in df.columns:
+            df[col] = encoders[col].transform(df[col].astype(str))
+    return df[FEATURES]
+
+
+def synthetic_features(encoders, n=10000, seed=0):
+    """Random inputs covering the ranges the app sidebar allows."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in FEATURES:
+        if col in SYNTHETIC_CHOICES:
+            data[col] = rng.choice(SYNTHETIC_CHOICES[col], size=n)
+        elif col == "oldpeak":
+            lo, hi = SYNTHETIC_RANGES[col]
+            data[col] = np.round(rng.uniform(lo, hi, size=n), 1)
+        else:
+            lo, hi = SYNTHETIC_RANGES[col]
+            data[col] = rng.integers(lo, hi + 1, size=n)
+    df = pd.DataFrame(data)
+    for col in encoders:
+        df[col] = encoders[col].transform(df[col])
+    return df
+
+
+# =========================
+# VERIFICATION REPORT
+# =========================
+def _best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def compare(model, qmodel, X, source):
+    """Rows whose predicted class or risk band differs between the models."""
+    ref_proba = model.predict_proba(X)[:, 1]
+    ref_pred = model.predict(X)
+    q_proba = qmodel.predict_proba(X)[:, 1]
+    q_pred = qmodel.predict(X)
+
+    changes = []
+    for i in range(len(X)):
+        ref_band, q_band = risk_band(ref_proba[i]), risk_band(q_proba[i])
+        if ref_pred[i] != q_pred[i] or ref_band != q_band:
+            changes.append({
+                "source": source,
+                "row": i,
+                "prediction": int(ref_pred[i]),
+                "quantized_prediction": int(q_pred[i]),
+                "probability": float(ref_proba[i]),
+                "quantized_probability": float(q_proba[i]),
+                "risk_band": ref_band,
+                "quantized_risk_band": q_band,
+            })
+    return {
+        "rows": len(X),
+        "changed": len(changes),
+        "max_abs_probability_error": float(np.max(np.abs(ref_proba - q_proba))),
+        "changes": changes,
+    }
+
+
+def verify(model, qmodel, scaler, encoders, repeat=20):
+    datasets = {
+        "heart.csv": scaler.transform(load_heart_features(encoders)),
+        "synthetic": scaler.transform(synthetic_features(encoders)),
+    }
+    report = {"mode": qmodel.mode, "datasets": {}}
+    for name, X in datasets.items():
+        report["datasets"][name] = compare(model, qmodel, X, name)
+
+    sk_memory = sklearn_forest_memory(model)
+    q_memory = qmodel.memory()
+    report["memory"] = {
+        part: {
+            "sklearn_bytes": sk_memory[part],
+            "quantized_bytes": q_memory[part],
+            "reduction": 1 - q_memory[part] / sk_memory[part],
+        }
+        for part in sk_memory
+    }
+    sk_total, q_total = sum(sk_memory.values()), sum(q_memory.values())
+    report["memory"]["total"] = {
+        "sklearn_bytes": sk_total,
+        "quantized_bytes": q_total,
+        "reduction": 1 - q_total / sk_total,
+    }
+
+    # Single row mirrors one app.py request: predict + predict_proba
+    row = datasets["heart.csv"][:1]
+    batch = datasets["synthetic"]
+    sk_single = _best_time(lambda: (model.predict(row), model.predict_proba(row)), repeat)
+    q_single = _best_time(lambda: (qmodel.predict(row), qmodel.predict_proba(row)), repeat)
+    sk_batch = _best_time(lambda: model.predict_proba(batch), max(3, repeat // 5))
+    q_batch = _best_time(lambda: qmodel.predict_proba(batch), max(3, repeat // 5))
+    report["latency"] = {
+        "single_row_sklearn_seconds": sk_single,
+        "single_row_quantized_seconds": q_single,
+        "single_row_speedup": sk_single / q_single,
+        "batch_rows": len(batch),
+        "batch_sklearn_seconds": sk_batch,
+        "batch_quantized_seconds": q_batch,
+        "batch_speedup": sk_batch / q_batch,
+    }
+    return report
+
+
+def print_report(report):
+    print(f"Quantization mode: {report['mode']}")
+    for name, d in report["datasets"].items():
+        print(f"  {name}: {d['changed']} of {d['rows']} predictions changed "
+              f"(max |dp| = {d['max_abs_probability_error']:.2e})")
+        for c in d["changes"]:
+            print(f"    row {c['row']}: class {c['prediction']} -> {c['quantized_prediction']}, "
+                  f"{c['risk_band']} -> {c['quantized_risk_band']} "
+                  f"(p {c['probability']:.4f} -> {c['quantized_probability']:.4f})")
+    print("  Memory (scikit-learn -> quantized):")
+    for part, m in report["memory"].items():
+        print(f"    {part:<14} {m['sklearn_bytes']:>10,} -> {m['quantized_bytes']:>10,} bytes "
+              f"({m['reduction']:.1%} smaller)")
+    print("    Only thresholds and leaf_values reflect quantization; training_only is")
+    print("    impurity / sample-count data that scikit-learn stores per node.")
+    lat = report["latency"]
+    print(f"  Single row: {lat['single_row_sklearn_seconds'] * 1e3:.2f} ms -> "
+          f"{lat['single_row_quantized_seconds'] * 1e3:.2f} ms ({lat['single_row_speedup']:.1f}x)")
+    print(f"  Batch of {lat['batch_rows']}: {lat['batch_sklearn_seconds'] * 1e3:.1f} ms -> "
+          f"{lat['batch_quantized_seconds'] * 1e3:.1f} ms ({lat['batch_speedup']:.2f}x)")
+    if lat['batch_speedup'] < 1:
+        print(f"  WARNING: batch inference is {1 / lat['batch_speedup']:.1f}x SLOWER than scikit-learn; "
+              f"the quantized engine only pays off for small requests such as app.py's single row.")
+
+
+# =========================
+# EXPORT
+# =========================
+def export(mode='float32'):
+    with warnings.catch_warnings():
+        # heart_model.pkl may come from an older scikit-learn
+        warnings.simplefilter("ignore")
+        model = joblib.load(MODEL_FILE)
+        encoders = joblib.load('encoders.pkl')
+        scaler = joblib.load('scaler.pkl')
+
+    print(f"Quantizing {MODEL_FILE} ({mode})...")
+    qmodel = QuantizedForest(model, mode, source_sha256=file_sha256(MODEL_FILE))
+
+    print("Verifying against heart.csv and synthetic inputs...")
+    report = verify(model, qmodel, scaler, encoders)
+    print_report(report)
+    report_file = REPORT_FILE.format(mode=mode)
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {report_file}")
+
+    joblib.dump(qmodel, QUANTIZED_MODEL_FILE)
+    print(f"Saved {QUANTIZED_MODEL_FILE}")
+    return qmodel, report
+
+
+if __name__ == "__main__":
+    # Import by name so the pickle references quantize.QuantizedForest
+    # rather than __main__.QuantizedForest, which app.py could not load
+    import quantize
+    quantize.export(sys.argv[1] if len(sys.argv) > 1 else 'float32')
@@ -0,0 +1,167 @@
+import csv
+import math
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from log_archive import FEATURES, LOG_FILES, LogArchive, compact, read_csv_log, to_micros
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PREDICTION_LOG = os.path.join(HERE, LOG_FILES[0])
+
+# Free-text patient names that look like numbers to float()
+TRICKY_NAMES = ["1234", "Nan", "inf", "Infinity", "0", "1"]
+
+
+def _append_app_rows(path, names):
+    """Append rows the way the current app.py does: username, prediction, probability."""
+    new_file = not path.exists()
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(FEATURES + ["username", "prediction", "probability", "timestamp"])
+        for i, name in enumerate(names):
+            features = [50, 1, 3, 120, 200, 0, 1, 150, 0, 1.0, 2, 0, 1]
+            writer.writerow(features + [name, i % 2, 0.29, f"2026-01-01 00:00:{i:02d}.123456"])
+
+
+def _same(a, b):
+    if a is None or (isinstance(a, float) and math.isnan(a)):
+        return b is None or pd.isna(b)
+    return a == b
+
+
+@pytest.fixture
+def logs(tmp_path):
+    paths = []
+    for name in LOG_FILES:
+        path = tmp_path / name
+        shutil.copy(os.path.join(HERE, name), path)
+        _append_app_rows(path, TRICKY_NAMES)
+        paths.append(path)
+    return paths
+
+
+@pytest.mark.parametrize("index", range(len(LOG_FILES)))
+def test_round_trip(logs, index):
+    path = logs[index]
+    expected = read_csv_log(path)
+    compact(str(path))
+
+    df = LogArchive(str(path.with_suffix(".hla"))).read()
+    assert len(df) == len(expected)
+    for record, row in zip(expected, df.to_dict("records")):
+        assert to_micros(row["timestamp"].to_pydatetime()) == record["timestamp"]
+        for col in FEATURES + ["username", "prediction", "prediction_label", "probability"]:
+            assert _same(record[col], row[col]), col
+
+    names = [r["username"] for r in expected[-len(TRICKY_NAMES):]]
+    assert names == TRICKY_NAMES
+    assert [r["prediction"] for r in expected[-len(TRICKY_NAMES):]] == [0, 1, 0, 1, 0, 1]
+
+
+def test_prediction_out_of_int8_range(tmp_path):
+    archive = LogArchive(str(tmp_path / "x.hla"))
+    record = read_csv_log(PREDICTION_LOG)[0]
+    with pytest.raises(ValueError, match="int8"):
+        archive.append([dict(record, prediction=1234)])
+    assert len(archive) == 0
+
+
+def test_rotate_keeps_rows_logged_during_compaction(logs, monkeypatch):
+    import log_archive
+
+    path = logs[0]
+    expected = len(read_csv_log(path))
+    real_read = log_archive._read_csv_rows
+
+    logged = []
+
+    def read_then_log(source):
+        rows = real_read(source)
+        # app.py logs a prediction while the job is running
+        if not logged:
+            _append_app_rows(path, ["late"])
+            logged.append(True)
+        return rows
+
+    monkeypatch.setattr(log_archive, "_read_csv_rows", read_then_log)
+    compact(str(path), rotate=True)
+
+    assert len(LogArchive(str(path.with_suffix(".hla")))) == expected
+    assert not (path.parent / (path.name + ".compacting")).exists()
+    assert [r["username"] for r in read_csv_log(path)] == ["late"]
+
+
+def test_reduction_counts_only_appended_rows(logs):
+    path = logs[0]
+    with open(path, "rb") as f:
+        lines = f.readlines()
+    first = compact(str(path))
+    assert first["csv_bytes"] == sum(len(line) for line in lines[1:])
+
+    line = b"50,1,3,120,200,0,1,150,0,1.0,2,0,1,next,0,0.29,2026-02-01 00:00:00.000001\r\n"
+    with open(path, "ab") as f:
+        f.write(line)
+    second = compact(str(path))
+    assert second["records"] == 1
+    assert second["csv_bytes"] == len(line)
+    assert second["csv_file_bytes"] == first["csv_file_bytes"] + len(line)
+
+
+def test_failed_append_rolls_back(tmp_path, monkeypatch):
+    path = str(tmp_path / "x.hla")
+    records = read_csv_log(PREDICTION_LOG)
+    archive = LogArchive(path, block_size=10)
+    archive.append(records[:20])
+    size = os.path.getsize(path)
+
+    real_encode = LogArchive._encode_block
+    calls = []
+
+    def encode_then_fail(self, chunk):
+        calls.append(chunk)
+        if len(calls) == 2:
+            raise OSError(28, "No space left on device")
+        return real_encode(self, chunk)
+
+    monkeypatch.setattr(LogArchive, "_encode_block", encode_then_fail)
+    with pytest.raises(OSError):
+        archive.append(records[20:])
+    monkeypatch.undo()
+
+    assert os.path.getsize(path) == size
+    assert len(archive) == len(LogArchive(path)) == 20
+    archive.append(records[20:])
+    assert len(LogArchive(path).read()) == len(records)
+
+
+def test_truncated_archive_is_reported_as_corrupt(tmp_path):
+    path = str(tmp_path / "x.hla")
+    LogArchive(path, block_size=10).append(read_csv_log(PREDICTION_LOG))
+    for cut in (10, 40, 200):
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:-cut])
+        with pytest.raises(ValueError, match="corrupt"):
+            LogArchive(path)
+
+
+def test_rotate_archives_out_of_order_rows(logs):
+    path = logs[0]
+    compact(str(path), rotate=True)
+    # Clock stepped back (DST fall-back / NTP): row older than the archive's newest
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows([
+            FEATURES + ["username", "prediction", "probability", "timestamp"],
+            [50, 1, 3, 120, 200, 0, 1, 150, 0, 1.0, 2, 0, 1, "earlier", 0, 0.29, "2025-12-15 00:00:00.000001"],
+        ])
+    report = compact(str(path), rotate=True)
+
+    assert report["records"] == 1
+    assert LogArchive(str(path.with_suffix(".hla"))).read()["username"].iloc[-1] == "earlier"
+    assert not path.exists()
+    assert not (path.parent / (path.name + ".compacting")).exists()
@@ -0,0 +1,54 @@
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+from quantize import MODES, QuantizedForest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope="module")
+def model():
+    with warnings.catch_warnings():
+        # heart_model.pkl may come from an older scikit-learn
+        warnings.simplefilter("ignore")
+        return joblib.load(os.path.join(HERE, "heart_model.pkl"))
+
+
+@pytest.fixture(scope="module")
+def inputs(model):
+    """Random scaled rows plus rows sitting exactly on, and one float32 step
+    either side of, the forest's split thresholds."""
+    rng = np.random.default_rng(0)
+    random_rows = rng.normal(size=(5000, model.n_features_in_))
+
+    splits = [(f, t) for est in model.estimators_
+              for f, t in zip(est.tree_.feature, est.tree_.threshold) if f >= 0]
+    picked = rng.choice(len(splits), size=2000, replace=False)
+    rows = []
+    for i in picked:
+        f, t = splits[i]
+        t32 = np.float32(t)
+        for x in (t, t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf))):
+            row = rng.normal(size=model.n_features_in_)
+            row[f] = x
+            rows.append(row)
+    return np.vstack([random_rows, np.array(rows)])
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_matches_sklearn(model, inputs, mode):
+    qmodel = QuantizedForest(model, mode)
+    np.testing.assert_array_equal(qmodel.predict(inputs), model.predict(inputs))
+    np.testing.assert_allclose(qmodel.predict_proba(inputs), model.predict_proba(inputs), rtol=0, atol=1e-12)
+
+
+def test_rejects_bad_shapes(model):
+    qmodel = QuantizedForest(model)
+    with pytest.raises(ValueError, match="2D"):
+        qmodel.predict(np.zeros(model.n_features_in_))
+    with pytest.raises(ValueError, match="features"):
+        qmodel.predict(np.zeros((1, model.n_features_in_ - 1)))
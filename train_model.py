@@ -1,38 +1,47 @@
+import os
+import json
 import pandas as pd
 import numpy as np
 import joblib
+from profiling import metrics, timer, profiler_from_env, PROFILE_ENV
+from quantize import QuantizedForest, QUANTIZED_MODEL_FILE, file_sha256
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 
+METRICS_FILE = 'training_metrics.json'
+
 def train():
+    metrics.reset()
     print("Loading data...")
     try:
-        df = pd.read_csv('heart.csv')
+        with timer("train_load_data"):
+            df = pd.read_csv('heart.csv')
     except FileNotFoundError:
         print("Error: heart.csv not found.")
         return
 
     # 1. Clean Data
     print("Cleaning data...")
-    # Drop useless columns if present
-    for col in ['id', 'dataset']:
-        if col in df.columns:
-            df = df.drop(columns=[col])
-
-    # Handle Missing Values
-    # Numeric -> Median
-    num_cols = df.select_dtypes(include=[np.number]).columns
-    for col in num_cols:
-        if df[col].isnull().any():
-            df[col].fillna(df[col].median(), inplace=True)
+    with timer("train_clean"):
+        # Drop useless columns if present
+        for col in ['id', 'dataset']:
+            if col in df.columns:
+                df = df.drop(columns=[col])
+
+        # Handle Missing Values
+        # Numeric -> Median
+        num_cols = df.select_dtypes(include=[np.number]).columns
+        for col in num_cols:
+            if df[col].isnull().any():
+                df[col].fillna(df[col].median(), inplace=True)
     
-    # Categorical -> Mode
-    cat_cols = df.select_dtypes(include=['object']).columns
-    for col in cat_cols:
-        if df[col].isnull().any():
-            df[col].fillna(df[col].mode()[0], inplace=True)
+        # Categorical -> Mode
+        cat_cols = df.select_dtypes(include=['object']).columns
+        for col in cat_cols:
+            if df[col].isnull().any():
+                df[col].fillna(df[col].mode()[0], inplace=True)
 
     # 2. Prepare Features & Target
     # Convert target 'num' to Binary (0 vs 1+)
@@ -46,44 +55,71 @@ def train():
 
     # 3. Encoding
     print("Encoding categorical features...")
-    encoders = {}
-    for col in cat_cols:
-        if col in X.columns:
-            le = LabelEncoder()
-            X[col] = le.fit_transform(X[col].astype(str))
-            encoders[col] = le
-    
+    with timer("train_encode"):
+        encoders = {}
+        for col in cat_cols:
+            if col in X.columns:
+                le = LabelEncoder()
+                X[col] = le.fit_transform(X[col].astype(str))
+                encoders[col] = le
+
     # Save Encoders
-    joblib.dump(encoders, 'encoders.pkl')
+    with timer("train_save"):
+        joblib.dump(encoders, 'encoders.pkl')
     print("Saved encoders.pkl")
 
     # 4. Splitting
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+    with timer("train_split"):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
     # 5. Scaling
     print("Scaling features...")
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
+    with timer("train_scale"):
+        scaler = StandardScaler()
+        X_train_scaled = scaler.fit_transform(X_train)
+        X_test_scaled = scaler.transform(X_test)
 
     # Save Scaler
-    joblib.dump(scaler, 'scaler.pkl')
+    with timer("train_save"):
+        joblib.dump(scaler, 'scaler.pkl')
     print("Saved scaler.pkl")
 
     # 6. Train Model
     print("Training Random Forest Model...")
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X_train_scaled, y_train)
+    with timer("train_fit"):
+        model = RandomForestClassifier(n_estimators=100, random_state=42)
+        model.fit(X_train_scaled, y_train)
 
     # Evaluate
-    y_pred = model.predict(X_test_scaled)
-    acc = accuracy_score(y_test, y_pred)
+    with timer("train_evaluate"):
+        y_pred = model.predict(X_test_scaled)
+        acc = accuracy_score(y_test, y_pred)
     print(f"Model Accuracy: {acc:.4f}")
     print(classification_report(y_test, y_pred))
 
     # 7. Save Model
-    joblib.dump(model, 'heart_model.pkl')
+    with timer("train_save"):
+        joblib.dump(model, 'heart_model.pkl')
     print("Saved heart_model.pkl")
 
+    # Keep the quantized copy used by app.py in sync (verify with quantize.py)
+    with timer("train_quantize"):
+        qmodel = QuantizedForest(model, source_sha256=file_sha256('heart_model.pkl'))
+        joblib.dump(qmodel, QUANTIZED_MODEL_FILE)
+    print(f"Saved {QUANTIZED_MODEL_FILE}")
+
+    # 8. Timing Summary
+    metrics.incr("train_rows", len(df))
+    metrics.write_json(METRICS_FILE)
+    print(json.dumps(metrics.summary(), indent=2))
+    print(f"Saved {METRICS_FILE}")
+
 if __name__ == "__main__":
-    train()
+    profiler = profiler_from_env()
+    try:
+        train()
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.dump(os.environ[PROFILE_ENV])
+            print(f"Saved profile to {os.environ[PROFILE_ENV]}")